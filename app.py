@@ -1,170 +1,501 @@
-import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import os
-
-# ==========================
-# LOAD HMDB REFERENCE TABLE
-# ==========================
-@st.cache_data
-def load_hmdb(csv_path: str = "hmdb_reference.csv") -> pd.DataFrame | None:
-    try:
-        return pd.read_csv(csv_path)
-    except FileNotFoundError:
-        return None
-
-hmdb_df = load_hmdb()
-
-# ==========================
-# LOAD LACTATE CSV
-# ==========================
-@st.cache_data
-def load_lactate(csv_path: str = "Data/lactate.csv") -> pd.DataFrame | None:
-    try:
-        df = pd.read_csv(csv_path)
-        if not all(col in df.columns for col in ["ppm", "intensity"]):
-            st.error("Lactate CSV must contain 'ppm' and 'intensity' columns.")
-            return None
-        return df
-    except FileNotFoundError:
-        st.error(f"Lactate CSV not found in '{csv_path}'.")
-        return None
-
-lactate_df = load_lactate()
-
-# ==========================
-# LOAD CREATINE CSV
-# ==========================
-@st.cache_data
-def load_creatine(csv_path="Data/creatine.csv") -> pd.DataFrame | None:
-    try:
-        df = pd.read_csv(csv_path)
-        if not all(col in df.columns for col in ["ppm", "intensity"]):
-            st.error("creatine CSV must contain 'ppm' and 'intensity' columns.")
-            return None
-        return df
-    except FileNotFoundError:
-        st.error(f"creatine CSV not found in '{csv_path}'.")
-        return None
-
-creatine_df = load_creatine()
-
-# ==========================
-# PLOT FUNCTION WITH PLOTLY (INTERACTIVE)
-# ==========================
-def plot_spectrum_interactive(sample_df: pd.DataFrame, title="Spectrum"):
-    sample_df = sample_df.sort_values("ppm", ascending=False)
-    fig = go.Figure()
-    fig.add_trace(
-        go.Scatter(
-            x=sample_df["ppm"],
-            y=sample_df["intensity"],
-            mode='lines',
-            line=dict(color='blue', width=2),
-            name='Intensity'
-        )
-    )
-    fig.update_layout(
-        title=title,
-        xaxis=dict(title='ppm', autorange='reversed'),
-        yaxis=dict(title='Intensity'),
-        hovermode='x unified',
-        height=500
-    )
-    st.plotly_chart(fig, use_container_width=True)
-
-# ==========================
-# STREAMLIT UI
-# ==========================
-st.title("🧪 NMR Peak Extractor + HMDB Comparator")
-
-# -------------------------
-# Experiment metadata
-# -------------------------
-st.sidebar.header("NMR Experiment Metadata")
-
-field_strength = st.sidebar.text_input("Magnetic Field Strength (MHz)", "600")
-pulse_seq = st.sidebar.text_input("Pulse Sequence", "90°")
-internal_std = st.sidebar.text_input("Internal Standard", "0.1 mM DSS")
-num_scans = st.sidebar.number_input("Number of Scans (NS)", value=256)
-water_supp = st.sidebar.text_input("Water Suppression Method", "WATERGATE")
-solvent = st.sidebar.text_input("Solvent", "D2O")
-sample_pH = st.sidebar.text_input("Sample pH", "")
-buffer_used = st.sidebar.text_input("Buffer", "")
-relax_delay = st.sidebar.text_input("Relaxation Delay (s)", "2.0")
-
-# -------------------------
-# Display Experiment Metadata in a tidy line format
-# -------------------------
-st.markdown("### 🧪 Experiment Metadata")
-
-col1, col2, col3 = st.columns(3)
-with col1:
-    st.markdown(f"**Field Strength:** {field_strength} MHz")
-    st.markdown(f"**Pulse Sequence:** {pulse_seq}")
-    st.markdown(f"**Internal Standard:** {internal_std}")
-with col2:
-    st.markdown(f"**Number of Scans:** {num_scans}")
-    st.markdown(f"**Water Suppression:** {water_supp}")
-    st.markdown(f"**Solvent:** {solvent}")
-with col3:
-    st.markdown(f"**pH:** {sample_pH}")
-    st.markdown(f"**Buffer:** {buffer_used}")
-    st.markdown(f"**Relaxation Delay:** {relax_delay} s")
-# Add a horizontal line separator
-st.markdown("---")
-
-# -------------------------
-# Metabolite search
-# -------------------------
-st.sidebar.header("Search Metabolites")
-search_name = st.sidebar.text_input("Enter metabolite name").lower()
-# ==========================
-# ==========================
-# ==========================
-# Display Lactate
-# ==========================
-if search_name == "lactate" and lactate_df is not None:
-    col1, col2 = st.columns([2, 1])  # left larger for spectrum, right smaller for image
-    # Spectrum
-    with col1:
-        plot_spectrum_interactive(lactate_df, title="Lactate Spectrum")
-    # Formula image
-    with col2:
-        img_path = "Data/Lactic_acid.png"
-        if os.path.exists(img_path):
-            st.image(img_path, caption="Lactic Acid (C3H6O3)", use_column_width=True)
-        else:
-            st.warning(f"⚠️ Formula image not found at '{img_path}'")
-    st.markdown("""
-    🔗 **NMR Prediction:**  
-    https://www.nmrdb.org/new_predictor/index.shtml?v=v2.173.0
-    """)
-    st.markdown("""
-    🔗 **HMDB:**  
-    https://hmdb.ca/metabolites/HMDB0000190
-    """)
-
-# ==========================
-# Display Creatine
-# ==========================
-if search_name == "creatine" and creatine_df is not None:
-    col1, col2 = st.columns([2, 1])  # spectrum left, image right
-    # Spectrum
-    with col1:
-        plot_spectrum_interactive(creatine_df, title="Creatine Spectrum")
-    # Formula image
-    with col2:
-        img_path = "Data/creatine.jpg"
-        if os.path.exists(img_path):
-            st.image(img_path, caption="Creatine (C4H9N3O2)", use_column_width=True)
-        else:
-            st.warning(f"⚠️ Formula image not found at '{img_path}'")
-    st.markdown("""
-    🔗 **NMR Prediction:**  
-    https://www.nmrdb.org/new_predictor/index.shtml?v=v2.173.0
-    """)
-    st.markdown("""
-    🔗 **HMDB 1D NMR Spectrum:**  
-    https://hmdb.ca/spectra/nmr_one_d/1064
-    """)
+import streamlit as st
+import pandas as pd
+import numpy as np
+import os
+from functools import lru_cache
+
+import match_numba
+
+# ==========================
+# PARQUET CACHE FOR CSV ASSETS
+# ==========================
+def _cached_parquet(csv_path: str) -> pd.DataFrame:
+    """Read a CSV asset via a sibling Parquet cache.
+
+    On first load the CSV is parsed once and written next to it as
+    '<name>.parquet'; later loads read the binary columnar file directly,
+    skipping CSV tokenization entirely.
+    """
+    parquet_path = os.path.splitext(csv_path)[0] + ".parquet"
+    if os.path.exists(parquet_path):
+        # Serve the binary sibling unless the CSV was edited after it
+        # was written (then reparse and refresh it below)
+        if (not os.path.exists(csv_path)
+                or os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)):
+            return pd.read_parquet(parquet_path, engine="pyarrow")
+    from pyarrow import csv as pa_csv
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(csv_path)
+    # pyarrow's reader parses chunks on all cores, unlike the
+    # single-threaded default pandas tokenizer
+    df = pa_csv.read_csv(csv_path).to_pandas()
+    try:
+        df.to_parquet(parquet_path, engine="pyarrow", compression="zstd")
+    except OSError:
+        pass  # read-only deployment: keep serving the parsed CSV
+    return df
+
+# ==========================
+# LOAD HMDB REFERENCE TABLE
+# ==========================
+# Columns the app actually reads; multiplicity_list and J_list are
+# dropped at load so every later row copy stays narrow
+_HMDB_COLUMNS = ["Name", "HMDB_ID", "ppm_list"]
+
+@st.cache_data(persist="disk")
+def load_hmdb(csv_path: str = "hmdb_reference.csv") -> pd.DataFrame | None:
+    try:
+        df = _cached_parquet(csv_path)
+        df = df[[c for c in _HMDB_COLUMNS if c in df.columns]]
+        # Lowercase once here so searches never re-lowercase the column
+        df["Name_lc"] = df["Name"].str.lower()
+        return df
+    except FileNotFoundError:
+        return None
+
+hmdb_df = load_hmdb()
+
+# ==========================
+# LOAD SPECTRUM CSVS
+# ==========================
+@st.cache_data(persist="disk")
+def load_spectrum(csv_path: str, label: str) -> pd.DataFrame | None:
+    """Shared loader for the per-metabolite spectrum CSVs."""
+    try:
+        df = _cached_parquet(csv_path)
+        if not all(col in df.columns for col in ["ppm", "intensity"]):
+            st.error(f"{label} CSV must contain 'ppm' and 'intensity' columns.")
+            return None
+        # Keep only the two plotted columns, pinned to float32: half the
+        # bytes on every downstream copy, and ~7 significant digits is
+        # far beyond NMR ppm resolution
+        df = df[["ppm", "intensity"]].astype(np.float32)
+        # Sort once here (NMR convention: high ppm first) so no consumer
+        # has to re-sort per rerun
+        return df.sort_values("ppm", ascending=False, ignore_index=True)
+    except FileNotFoundError:
+        st.error(f"{label} CSV not found in '{csv_path}'.")
+        return None
+
+# Dispatch table for locally bundled spectra: one dict lookup routes a
+# query to its assets, instead of a chain of per-metabolite branches
+# each duplicating the render block
+LOCAL_SPECTRA = {
+    "lactate": {
+        "label": "Lactate",
+        "csv": "Data/lactate.csv",
+        "image": "Data/Lactic_acid.png",
+        "caption": "Lactic Acid (C3H6O3)",
+        "links": (
+            "🔗 **NMR Prediction:**  \n"
+            "https://www.nmrdb.org/new_predictor/index.shtml?v=v2.173.0",
+            "🔗 **HMDB:**  \nhttps://hmdb.ca/metabolites/HMDB0000190",
+        ),
+    },
+    "creatine": {
+        "label": "Creatine",
+        "csv": "Data/creatine.csv",
+        "image": "Data/creatine.jpg",
+        "caption": "Creatine (C4H9N3O2)",
+        "links": (
+            "🔗 **NMR Prediction:**  \n"
+            "https://www.nmrdb.org/new_predictor/index.shtml?v=v2.173.0",
+            "🔗 **HMDB 1D NMR Spectrum:**  \n"
+            "https://hmdb.ca/spectra/nmr_one_d/1064",
+        ),
+    },
+}
+
+# ==========================
+# HMDB NAME LOOKUP INDEX
+# ==========================
+@st.cache_data(hash_funcs={pd.DataFrame: id})
+def _hmdb_name_index(hmdb_df: pd.DataFrame):
+    """Sorted lowercase name array plus row order, built once so prefix
+    lookups are two binary searches instead of a full column scan."""
+    names = hmdb_df["Name_lc"].fillna("").to_numpy(dtype=object)
+    order = np.argsort(names)
+    return names[order], order
+
+def search_hmdb_names(hmdb_df: pd.DataFrame, query: str) -> pd.DataFrame:
+    """Find metabolites whose name starts with query (binary search on
+    the sorted index); fall back to a substring scan for mid-name hits.
+    A full name typed exactly short-circuits to vectorized equality."""
+    exact = hmdb_df["Name_lc"].to_numpy() == query
+    if exact.any():
+        return hmdb_df[exact]
+    sorted_names, order = _hmdb_name_index(hmdb_df)
+    lo = np.searchsorted(sorted_names, query)
+    hi = np.searchsorted(sorted_names, query + "\uffff")
+    if hi > lo:
+        return hmdb_df.iloc[np.sort(order[lo:hi])]
+    return hmdb_df[hmdb_df["Name_lc"].str.contains(query, regex=False, na=False)]
+
+# ==========================
+# MATCH SAMPLE PEAKS TO HMDB
+# ==========================
+@st.cache_data(hash_funcs={pd.DataFrame: id})
+def _hmdb_peak_arrays(hmdb_df: pd.DataFrame):
+    """Flatten the ';'-separated ppm_list column into contiguous arrays.
+
+    Returns (peaks_flat, row_idx, lengths) where row_idx maps every flat
+    peak back to its HMDB row, so matching can run as NumPy kernels
+    instead of per-row Python loops. The string parsing itself is
+    vectorized (split/explode/to_numeric) and runs once per process.
+    """
+    n = len(hmdb_df)
+    exploded = (
+        hmdb_df["ppm_list"].fillna("").astype(str)
+        .str.split(";").explode()
+    )
+    values = pd.to_numeric(exploded, errors="coerce")
+    values = values[values.notna()]
+    # float32 halves the bytes scanned per match; chemical-shift values
+    # only carry 3-4 significant digits anyway
+    peaks_flat = values.to_numpy(dtype=np.float32)
+    row_idx = hmdb_df.index.get_indexer(values.index).astype(np.int64)
+    lengths = np.bincount(row_idx, minlength=n).astype(np.int64)
+    return peaks_flat, row_idx, lengths
+
+def extract_peaks(sample_df: pd.DataFrame, rel_height: float = 0.05) -> np.ndarray:
+    """Pick peak positions (ppm) as local intensity maxima above a
+    fraction of the strongest signal."""
+    ppm = sample_df["ppm"].to_numpy(dtype=np.float64)
+    intensity = sample_df["intensity"].to_numpy(dtype=np.float64)
+    if intensity.size < 3:
+        return ppm
+    interior = intensity[1:-1]
+    is_max = (interior >= intensity[:-2]) & (interior >= intensity[2:])
+    keep = is_max & (interior >= rel_height * intensity.max())
+    return ppm[1:-1][keep]
+
+def match_to_hmdb(sample_peaks: np.ndarray, hmdb_df: pd.DataFrame,
+                  tol: float = 0.02) -> pd.DataFrame:
+    """Score every HMDB metabolite against the sample peak positions.
+
+    An HMDB peak is hit iff its nearest sample peak lies within tol, so
+    each flat HMDB peak is binary-searched against the sorted sample
+    peaks and checked against its two neighbors — O((N+M) log N) with no
+    N x M intermediate, then a bincount over row ids.
+    """
+    peaks_flat, row_idx, lengths = _hmdb_peak_arrays(hmdb_df)
+    n = len(hmdb_df)
+    if sample_peaks.size == 0 or peaks_flat.size == 0:
+        matches = np.zeros(n)
+    elif match_numba.NUMBA_AVAILABLE:
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        matches = np.empty(n, dtype=np.float64)
+        match_numba.score_all(np.sort(sample_peaks),
+                              peaks_flat, offsets, tol, matches)
+    else:
+        sample_sorted = np.sort(sample_peaks)
+        idx = np.searchsorted(sample_sorted, peaks_flat)
+        lo = sample_sorted[np.clip(idx - 1, 0, sample_sorted.size - 1)]
+        hi = sample_sorted[np.clip(idx, 0, sample_sorted.size - 1)]
+        nearest = np.minimum(np.abs(peaks_flat - lo), np.abs(peaks_flat - hi))
+        per_peak_hit = nearest <= tol
+        matches = np.bincount(row_idx, weights=per_peak_hit, minlength=n)
+    result = hmdb_df[["Name", "HMDB_ID"]].copy()
+    result["matched_peaks"] = matches.astype(int)
+    result["total_peaks"] = lengths
+    result["score"] = np.divide(matches, lengths, out=np.zeros(n), where=lengths > 0)
+    return result.sort_values("score", ascending=False).reset_index(drop=True)
+
+# Upper bounds on rendered rows: scoring runs over the full table, but
+# nobody scrolls thousands of rows and the browser pays for each one
+MAX_MATCH_ROWS = 50
+MAX_SEARCH_RESULTS = 50
+
+def render_hmdb_matches(sample_df: pd.DataFrame):
+    if hmdb_df is None:
+        return
+    sample_peaks = extract_peaks(sample_df)
+    result = match_to_hmdb(sample_peaks, hmdb_df)
+    st.markdown("### 🔍 HMDB Peak Matches")
+    st.dataframe(result.head(MAX_MATCH_ROWS), width="stretch")
+
+# ==========================
+# PLOT FUNCTION WITH PLOTLY (INTERACTIVE)
+# ==========================
+MAX_PLOT_POINTS = 4000
+
+# One shared layout for every spectrum figure: built (and validated by
+# Plotly) once, so per-figure styling is a title plus this template
+_SPECTRUM_LAYOUT = dict(
+    xaxis=dict(title='ppm', autorange='reversed'),  # NMR style: high ppm left
+    yaxis=dict(title='Intensity'),
+    hovermode='x unified',
+    height=500,
+)
+
+def _lttb(x: np.ndarray, y: np.ndarray, n_out: int):
+    """Largest-triangle-three-buckets downsampling.
+
+    Keeps the visually dominant point per bucket (max triangle area with
+    the previous kept point and the next bucket's mean), so narrow NMR
+    peaks survive while the browser only receives n_out points.
+    """
+    n = x.size
+    if n_out >= n or n_out < 3:
+        return x, y
+    buckets = np.array_split(np.arange(1, n - 1), n_out - 2)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+    a = 0
+    for i, bucket in enumerate(buckets):
+        if i + 1 < len(buckets):
+            nxt = buckets[i + 1]
+            avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        area = np.abs((x[a] - avg_x) * (y[bucket] - y[a])
+                      - (x[a] - x[bucket]) * (avg_y - y[a]))
+        a = bucket[np.argmax(area)]
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+def _minmax_bin(x: np.ndarray, y: np.ndarray, n_bins: int):
+    """Keep the min and max intensity point of each of n_bins equal
+    slices — a fully vectorized pre-reduction for very long traces, so
+    the per-bucket Python loop in _lttb only ever sees a bounded input.
+    Keeping both extremes preserves negative lobes of dispersive peaks.
+    """
+    n = x.size
+    width = n // n_bins
+    if width < 2:
+        return x, y
+    m = n_bins * width
+    yb = y[:m].reshape(n_bins, width)
+    starts = np.arange(n_bins) * width
+    idx = np.concatenate([starts + yb.argmin(axis=1),
+                          starts + yb.argmax(axis=1),
+                          np.arange(m, n)])
+    idx = np.unique(idx)
+    return x[idx], y[idx]
+
+# The data arguments are excluded from the cache key: a figure is fully
+# determined by cache_key (source path + zoom window) and title, so
+# reruns skip hashing the sliced frame and peak array entirely
+@st.cache_data(hash_funcs={pd.DataFrame: lambda _: 0, np.ndarray: lambda _: 0})
+def _build_spectrum_figure(sample_df: pd.DataFrame, title: str,
+                           peaks: np.ndarray | None = None,
+                           cache_key=None):
+    """Build the spectrum figure once per (cache_key, title); reruns
+    reuse the cached Figure instead of reserializing all the traces."""
+    # Deferred import: plotly costs ~100ms+ at startup and is only
+    # needed once a spectrum is actually drawn
+    import plotly.graph_objects as go
+    # load_spectrum already returns frames sorted high-ppm-first, and
+    # _zoom_region slices preserve that order — no re-sort needed here
+    ppm = sample_df["ppm"].to_numpy(dtype=np.float64)
+    intensity = sample_df["intensity"].to_numpy(dtype=np.float64)
+    if ppm.size > 8 * MAX_PLOT_POINTS:
+        ppm, intensity = _minmax_bin(ppm, intensity, 2 * MAX_PLOT_POINTS)
+    if ppm.size > MAX_PLOT_POINTS:
+        ppm, intensity = _lttb(ppm, intensity, MAX_PLOT_POINTS)
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scattergl(
+            x=ppm,
+            y=intensity,
+            mode='lines',
+            line=dict(color='blue', width=2),
+            name='Intensity'
+        )
+    )
+    if peaks is not None and len(peaks):
+        # One None-separated trace draws every peak marker as a single
+        # batched primitive instead of one vline shape per peak
+        top = float(sample_df["intensity"].max())
+        xs = np.repeat(peaks, 3).astype(object)
+        xs[2::3] = None
+        ys = np.tile(np.array([0.0, top, None], dtype=object), len(peaks))
+        fig.add_trace(
+            go.Scattergl(
+                x=xs,
+                y=ys,
+                mode='lines',
+                line=dict(color='crimson', width=1),
+                name='Picked peaks'
+            )
+        )
+    fig.update_layout(title=title, **_SPECTRUM_LAYOUT)
+    return fig
+
+def plot_spectrum_interactive(sample_df: pd.DataFrame, title="Spectrum",
+                              peaks: np.ndarray | None = None,
+                              cache_key=None):
+    fig = _build_spectrum_figure(sample_df, title, peaks, cache_key)
+    st.plotly_chart(fig, width="stretch")
+
+def _zoom_region(sample_df: pd.DataFrame, ppm_min: float,
+                 ppm_max: float) -> pd.DataFrame:
+    """Slice a load-time-sorted (descending ppm) spectrum down to
+    [ppm_min, ppm_max] with two binary searches — no boolean mask over
+    the full trace."""
+    ppm = sample_df["ppm"].to_numpy()
+    asc = ppm[::-1]
+    lo = np.searchsorted(asc, ppm_min, side="left")
+    hi = np.searchsorted(asc, ppm_max, side="right")
+    n = ppm.size
+    return sample_df.iloc[n - hi:n - lo]
+
+# ==========================
+# FORMULA IMAGES
+# ==========================
+_STRUCTURE_CACHE_DIR = os.path.join("Data", "structures")
+
+@st.cache_data(show_spinner=False)
+def _structure_img_src(hmdb_id: str) -> str:
+    """img src for a metabolite structure: served from a local thumbnail
+    cache (downloaded once, embedded as a data URI) so repeat searches
+    never re-fetch from hmdb.ca; falls back to the remote URL when the
+    download fails."""
+    url = f"https://hmdb.ca/metabolites/{hmdb_id}.png"
+    path = os.path.join(_STRUCTURE_CACHE_DIR, f"{hmdb_id}.png")
+    if not os.path.exists(path):
+        try:
+            import requests
+            resp = requests.get(url, timeout=5)
+            resp.raise_for_status()
+            os.makedirs(_STRUCTURE_CACHE_DIR, exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(resp.content)
+        except Exception:
+            return url
+    import base64
+    with open(path, "rb") as f:
+        return "data:image/png;base64," + base64.b64encode(f.read()).decode()
+
+@lru_cache(maxsize=None)
+def _image_exists(path: str) -> bool:
+    """Memoized os.path.exists: the bundled formula images don't come
+    and go while the app runs, so don't stat the disk every rerun."""
+    return os.path.exists(path)
+
+@st.cache_data
+def _load_image_bytes(path: str) -> bytes:
+    """Read a formula image once; reruns serve the in-memory buffer
+    instead of hitting the filesystem again."""
+    with open(path, "rb") as f:
+        return f.read()
+
+# ==========================
+# STREAMLIT UI
+# ==========================
+st.title("🧪 NMR Peak Extractor + HMDB Comparator")
+
+# -------------------------
+# Experiment metadata
+# -------------------------
+st.sidebar.header("NMR Experiment Metadata")
+
+# One form instead of nine live widgets: editing metadata triggers a
+# single rerun on Apply, not one per field interaction
+with st.sidebar.form("experiment_metadata"):
+    field_strength = st.text_input("Magnetic Field Strength (MHz)", "600")
+    pulse_seq = st.text_input("Pulse Sequence", "90°")
+    internal_std = st.text_input("Internal Standard", "0.1 mM DSS")
+    num_scans = st.number_input("Number of Scans (NS)", value=256)
+    water_supp = st.text_input("Water Suppression Method", "WATERGATE")
+    solvent = st.text_input("Solvent", "D2O")
+    sample_pH = st.text_input("Sample pH", "")
+    buffer_used = st.text_input("Buffer", "")
+    relax_delay = st.text_input("Relaxation Delay (s)", "2.0")
+    st.form_submit_button("Apply")
+
+# -------------------------
+# Display Experiment Metadata in a tidy line format
+# -------------------------
+st.markdown("### 🧪 Experiment Metadata")
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.markdown(f"**Field Strength:** {field_strength} MHz")
+    st.markdown(f"**Pulse Sequence:** {pulse_seq}")
+    st.markdown(f"**Internal Standard:** {internal_std}")
+with col2:
+    st.markdown(f"**Number of Scans:** {num_scans}")
+    st.markdown(f"**Water Suppression:** {water_supp}")
+    st.markdown(f"**Solvent:** {solvent}")
+with col3:
+    st.markdown(f"**pH:** {sample_pH}")
+    st.markdown(f"**Buffer:** {buffer_used}")
+    st.markdown(f"**Relaxation Delay:** {relax_delay} s")
+# Add a horizontal line separator
+st.markdown("---")
+
+# -------------------------
+# Metabolite search
+# -------------------------
+@st.fragment
+def metabolite_search_section():
+    """Search input plus results, spectra and peak matching.
+
+    Runs as a fragment: interacting with the search box reruns only
+    this section, not the metadata widgets and header above.
+    """
+    st.sidebar.header("Search Metabolites")
+    # A form batches the widgets: the fragment reruns on Search, not on
+    # every keystroke or slider drag
+    with st.sidebar.form("metabolite_search"):
+        search_name = st.text_input("Enter metabolite name").lower()
+        ppm_lo, ppm_hi = st.slider(
+            "ppm window", -3.0, 13.0, (-3.0, 13.0), step=0.1,
+            help="Zoom the displayed spectrum to this ppm range"
+        )
+        st.form_submit_button("Search")
+
+    # ==========================
+    # HMDB NAME SEARCH RESULTS
+    # ==========================
+    if search_name and hmdb_df is not None:
+        matches = search_hmdb_names(hmdb_df, search_name).head(MAX_SEARCH_RESULTS)
+        if not matches.empty:
+            st.subheader(f"Results for '{search_name}'")
+            # itertuples avoids materializing a Series per row; the structure
+            # image goes out as a lazy-loading <img> so the browser defers
+            # offscreen fetches and honors hmdb.ca's cache headers. All
+            # rows are joined into one st.markdown call: a single element
+            # in the Streamlit delta tree instead of one per match
+            blocks = [
+                f"### {row.Name} ({row.HMDB_ID})\n\n"
+                f"Peaks (ppm): {row.ppm_list}\n\n"
+                f"[View on HMDB](https://hmdb.ca/metabolites/{row.HMDB_ID})\n\n"
+                f'<img src="{_structure_img_src(row.HMDB_ID)}" '
+                f'width="200" loading="lazy" decoding="async">'
+                for row in matches.itertuples(index=False)
+            ]
+            st.markdown("\n\n---\n\n".join(blocks), unsafe_allow_html=True)
+    # ==========================
+    # Display local spectrum (lactate, creatine, ...)
+    # ==========================
+    entry = LOCAL_SPECTRA.get(search_name)
+    # Lazy: a spectrum CSV is only parsed the first time its metabolite
+    # is queried (load_spectrum memoizes after that)
+    sample_df = (load_spectrum(entry["csv"], entry["label"])
+                 if entry is not None else None)
+    if entry is not None and sample_df is not None:
+        view = _zoom_region(sample_df, ppm_lo, ppm_hi)
+        # distinct names: col1/col2 already refer to the metadata columns
+        spec_col, img_col = st.columns([2, 1])  # left larger for spectrum, right smaller for image
+        # Spectrum
+        with spec_col:
+            plot_spectrum_interactive(view, title=f"{entry['label']} Spectrum",
+                                      peaks=extract_peaks(view),
+                                      cache_key=(entry["csv"], ppm_lo, ppm_hi))
+        # Formula image
+        with img_col:
+            img_path = entry["image"]
+            if _image_exists(img_path):
+                st.image(_load_image_bytes(img_path), caption=entry["caption"],
+                         width="stretch")
+            else:
+                st.warning(f"⚠️ Formula image not found at '{img_path}'")
+        for link in entry["links"]:
+            st.markdown(link)
+        render_hmdb_matches(sample_df)
+
+metabolite_search_section()
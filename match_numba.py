@@ -0,0 +1,55 @@
+"""Numba-compiled kernel for sample-vs-HMDB peak matching.
+
+The kernel keeps the plain nested-loop structure but runs it as
+LLVM-compiled machine code with prange across metabolites, so large
+peak tables avoid per-comparison Python overhead entirely. cache=True
+persists the compiled function on disk, so Streamlit reruns (and
+restarts) skip recompilation.
+"""
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:  # pragma: no cover - numba is in requirements.txt
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True, fastmath=True)
+    def score_all(sample, peaks, offsets, tol, out):
+        """Count matched HMDB peaks per metabolite.
+
+        sample:  float64[:] sample peak positions (ppm), SORTED ascending
+        peaks:   float64[:] flat HMDB peak positions, row-contiguous
+        offsets: int64[:]   row i owns peaks[offsets[i]:offsets[i+1]]
+        out:     float64[:] receives the matched-peak count per row
+
+        Each HMDB peak is resolved with an inlined binary search against
+        the sorted sample peaks (nearest neighbor decides the hit), so a
+        row costs O(len(row) * log N_sample) instead of a linear scan
+        per peak.
+        """
+        n_sample = sample.size
+        for i in prange(offsets.size - 1):
+            hits = 0.0
+            for j in range(offsets[i], offsets[i + 1]):
+                p = peaks[j]
+                lo, hi = 0, n_sample
+                while lo < hi:
+                    mid = (lo + hi) >> 1
+                    if sample[mid] < p:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                best = 1e308
+                if lo < n_sample:
+                    best = abs(sample[lo] - p)
+                if lo > 0:
+                    d = abs(sample[lo - 1] - p)
+                    if d < best:
+                        best = d
+                if best <= tol:
+                    hits += 1.0
+            out[i] = hits
+else:
+    score_all = None
@@ -0,0 +1,8 @@
+#!/usr/bin/env bash
+# Precompile the app to bytecode before launching so the first request
+# never pays compile time. Deployment images can run the same compileall
+# step at build time and ship the resulting __pycache__.
+set -e
+cd "$(dirname "$0")"
+python -m compileall -q app.py match_numba.py
+exec streamlit run app.py "$@"